@@ -11,38 +11,106 @@ Examples:
 """
 
 import argparse
-import csv
 import json
-import random
+import os
+import re
+from itertools import islice
 from pathlib import Path
+from typing import Iterable, Iterator
 
+import numpy as np
 
-def load_mrt_postal_codes(path: Path, max_count: int) -> list[str]:
-    """Load up to `max_count` postal codes from mrt_data JSON file."""
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is the fallback
+    orjson = None
 
-    seen = set()
-    postals: list[str] = []
+try:
+    import ijson
+except ImportError:  # optional; only used for large MRT files
+    ijson = None
 
-    for entry in data:
-        locations = entry.get("Possible Locations", [])
-        if not locations:
-            continue
-        postal = locations[0].get("POSTAL")
-        if not postal:
-            continue
-        postal = str(postal).strip()
-        if len(postal) != 6 or not postal.isdigit():
-            continue
+CSV_HEADER = b"postal_code,demand\n"
+WRITE_CHUNK_ROWS = 10_000
+# Below this size a full orjson parse beats ijson streaming even when only a
+# handful of entries are needed (the bundled mrt_data.json is ~100 KB).
+STREAM_MIN_BYTES = 1024 * 1024
+
+is_valid_postal = re.compile(r"[0-9]{6}").fullmatch
+
+
+def iter_mrt_entries(path: Path) -> Iterator[dict]:
+    """Yield mrt_data entries, streaming large files so callers can stop early."""
+    if ijson and path.stat().st_size >= STREAM_MIN_BYTES:
+        with path.open("rb") as f:
+            yield from ijson.items(f, "item")
+        return
+    raw = path.read_bytes()
+    yield from (orjson.loads(raw) if orjson else json.loads(raw))
+
+
+def unique_postals(postals: Iterable[str]) -> Iterator[str]:
+    """Yield each postal code the first time it appears, preserving order."""
+    seen: set[str] = set()
+    for postal in postals:
         if postal in seen:
             continue
         seen.add(postal)
-        postals.append(postal)
-        if len(postals) >= max_count:
-            break
+        yield postal
+
 
-    return postals
+def load_mrt_postal_codes(path: Path, max_count: int) -> Iterator[str]:
+    """Yield up to `max_count` unique postal codes from mrt_data JSON file."""
+    candidates = (
+        str(postal).strip()
+        for entry in iter_mrt_entries(path)
+        if (locations := entry.get("Possible Locations"))
+        and (postal := locations[0].get("POSTAL"))
+    )
+    # Dedupe lazily (rather than dict.fromkeys over everything) so islice can
+    # stop the underlying parse as soon as `max_count` postals are found.
+    yield from islice(unique_postals(filter(is_valid_postal, candidates)), max_count)
+
+
+def write_customers_csv(
+    path: Path,
+    postals: Iterable[str],
+    rng: np.random.Generator,
+    demand_min: int,
+    demand_max: int,
+) -> int:
+    """Write `postal_code,demand` rows in bulk, chunked to bound memory.
+
+    Postals are consumed straight from the iterable and demands are drawn per
+    chunk (the same stream as one up-front draw). Postal codes are validated
+    6-digit strings and demands are plain ints, so rows are formatted directly
+    instead of going through csv.writer quoting, and each chunk is encoded
+    once and written to a binary file. Returns the number of rows written.
+
+    Rows go to a temp file that replaces `path` only once every postal has
+    been read, so a missing or malformed MRT file leaves the output untouched.
+    """
+    postals = iter(postals)
+    written = 0
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    try:
+        with tmp_path.open("wb") as f:
+            f.write(CSV_HEADER)
+            while chunk := list(islice(postals, WRITE_CHUNK_ROWS)):
+                demands = rng.integers(
+                    demand_min, demand_max + 1, size=len(chunk), dtype=np.int64
+                )
+                rows = [
+                    f"{postal},{demand}\n"
+                    for postal, demand in zip(chunk, demands.tolist())
+                ]
+                f.write("".join(rows).encode())
+                written += len(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return written
 
 
 def resolve_output_path(path_str: str, repo_root: Path) -> Path:
@@ -96,11 +164,13 @@ def main() -> None:
         "--seed",
         type=int,
         default=default_seed,
-        help="Random seed for deterministic postal ordering and demand values",
+        help="Seed for numpy's default_rng; fixes the drawn demand values",
     )
 
     args = parser.parse_args()
 
+    if args.count < 0:
+        raise ValueError("Invalid count; ensure it is zero or positive.")
     if args.demand_min <= 0 or args.demand_max < args.demand_min:
         raise ValueError(
             "Invalid demand range; ensure max >= min and both are positive."
@@ -110,20 +180,16 @@ def main() -> None:
     print(f"Loading up to {args.count} customer postal codes from {mrt_path}...")
     postals = load_mrt_postal_codes(mrt_path, args.count)
 
-    rng = random.Random(args.seed)
-
     output_path = resolve_output_path(args.output, repo_root)
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    with output_path.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["postal_code", "demand"])
-        for postal in postals:
-            demand = rng.randint(args.demand_min, args.demand_max)
-            writer.writerow([postal, demand])
+    rng = np.random.default_rng(args.seed)
+    written = write_customers_csv(
+        output_path, postals, rng, args.demand_min, args.demand_max
+    )
 
     print(
-        f"Done! Saved {len(postals)} customer rows (with demand) to: {output_path} using seed {args.seed}"
+        f"Done! Saved {written} customer rows (with demand) to: {output_path} using seed {args.seed}"
     )
 
 
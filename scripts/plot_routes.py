@@ -7,28 +7,49 @@ Inputs:
 - Customers CSV (default: data/customers.csv) with columns postal_code,demand.
 
 Environment:
-- ONE_MAP_EMAIL and ONE_MAP_PASS must be set for OneMap token retrieval.
+- ONE_MAP_EMAIL and ONE_MAP_PASS must be set for OneMap token retrieval
+  (only needed when some postal codes are not in the geocode cache yet).
 
 Usage (with uv):
     uv pip install folium requests
+    uv pip install orjson  # optional, faster JSON load/save
+    uv pip install pandas  # optional, faster parsing of large customer CSVs
     uv run scripts/visualize_routes.py routes.json --output map.html
 
 Optional flags:
     --customers data/customers.csv   # override customers CSV path
-    --cache data/geo_cache.json      # JSON cache for geocoded coordinates
+    --cache data/geo_cache.db        # SQLite cache for geocoded coordinates
+                                     # (seeded once from data/geo_cache.json;
+                                     # a .json path uses the .db beside it)
     --warehouse 207224               # warehouse postal code for centering
 """
 
 import argparse
+import csv
+import html
 import json
 import os
+import sqlite3
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import folium
+import numpy as np
 import requests
+from branca.element import MacroElement
+from folium.template import Template
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is the fallback
+    orjson = None
 
 ONEMAP_TOKEN_URL = "https://www.onemap.gov.sg/api/auth/post/getToken"
 
@@ -37,38 +58,149 @@ ONEMAP_SEARCH_URL = (
     "?searchVal={postal}&returnGeom=Y&getAddrDetails=Y&pageNum=1"
 )
 
+ONEMAP_TOKEN_CACHE = (
+    Path(__file__).resolve().parent.parent / "data" / ".onemap_token.json"
+)
+# Refetch a cached token once it is this close (in seconds) to expiring.
+TOKEN_EXPIRY_MARGIN = 300
+
+GEOCODE_WORKERS = 16
+
+# Customer CSVs at least this large are parsed with pandas' C tokenizer; below
+# it the pandas import alone costs more than the plain Python loop.
+PANDAS_MIN_BYTES = 1024 * 1024
+
+# Stay well under SQLite's bound-parameter limit for `postal IN (...)` lookups.
+SQLITE_IN_CHUNK = 500
+
+# Shared session so every OneMap call reuses pooled keep-alive connections
+# instead of paying a fresh TCP/TLS handshake per request.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.2),
+    ),
+)
+# Serializes token refreshes when several geocode workers hit a 401 at once.
+_AUTH_LOCK = threading.Lock()
+
+
+def dumps_coords(coords: np.ndarray) -> str:
+    """Serialize an (N, 2) float64 array straight from its buffer when possible."""
+    if orjson:
+        return orjson.dumps(coords, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(coords.tolist())
+
+
+def read_json(path: Path):
+    raw = path.read_bytes()
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
 
 def load_routes(path: Path) -> List[List[str]]:
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = read_json(path)
     if isinstance(data, dict) and "routes" in data:
         routes = data["routes"]
     else:
         routes = data
     if not isinstance(routes, list):
         raise ValueError("Routes JSON must be a list or an object with key 'routes'.")
-    normalized = []
     for idx, route in enumerate(routes):
         if not isinstance(route, list):
             raise ValueError(f"Route {idx} is not a list")
-        normalized.append([str(p).strip() for p in route if str(p).strip()])
-    return normalized
+    # Stringify and strip each postal once, skipping blanks.
+    return [
+        [s for p in route if (s := (p if isinstance(p, str) else str(p)).strip())]
+        for route in routes
+    ]
+
+
+def load_customers_pandas(path: Path) -> Dict[str, int]:
+    import pandas as pd
+
+    # Mirror the Python loop exactly: positional columns with no header row
+    # (a `postal_code,demand` header is just a row that gets dropped below),
+    # quotes kept verbatim, a missing demand column tolerated and extra
+    # columns ignored.
+    df = pd.read_csv(
+        path,
+        header=None,
+        names=["postal_code", "demand"],
+        index_col=False,
+        dtype="string",
+        quoting=csv.QUOTE_NONE,
+        skip_blank_lines=True,
+    )
+    postals = df["postal_code"].str.strip()
+    keep = postals.notna() & (postals != "") & (postals != "postal_code")
+    demands = df.loc[keep, "demand"].str.strip().fillna("")
+    # int() rather than pd.to_numeric so non-integer demands raise, as in
+    # the loop, instead of being truncated.
+    return dict(
+        zip(
+            postals[keep].tolist(),
+            [int(demand) if demand else 0 for demand in demands.tolist()],
+        )
+    )
 
 
 def load_customers(path: Path) -> Dict[str, int]:
+    if path.stat().st_size >= PANDAS_MIN_BYTES:
+        try:
+            return load_customers_pandas(path)
+        except ImportError:
+            pass
+        except ValueError:
+            # Shapes the C tokenizer rejects (e.g. rows with extra columns
+            # after a shorter first row) or bad demands: let the loop below,
+            # which defines the accepted format, parse or reject the file.
+            pass
     demands: Dict[str, int] = {}
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            parts = [p.strip() for p in line.split(",")]
-            if not parts or not parts[0] or parts[0] == "postal_code":
-                continue
-            postal = parts[0]
-            demand = int(parts[1]) if len(parts) > 1 and parts[1] else 0
-            demands[postal] = demand
+    # One read + C-level split; only the two fields used are stripped.
+    for line in path.read_text(encoding="utf-8").splitlines():
+        postal, _, rest = line.partition(",")
+        postal = postal.strip()
+        if not postal or postal == "postal_code":
+            continue
+        demand = rest.partition(",")[0].strip()
+        demands[postal] = int(demand) if demand else 0
     return demands
 
 
-def get_onemap_token() -> str:
+def load_cached_token(path: Path = ONEMAP_TOKEN_CACHE) -> Optional[str]:
+    try:
+        data = read_json(path)
+        token = data["access_token"]
+        expiry = int(data["expiry_timestamp"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if expiry - time.time() <= TOKEN_EXPIRY_MARGIN:
+        return None
+    return token
+
+
+def save_cached_token(
+    token: str, expiry: int, path: Path = ONEMAP_TOKEN_CACHE
+) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = json.dumps({"access_token": token, "expiry_timestamp": expiry})
+    # Owner-only permissions: the file holds a live bearer token.
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    # The mode above only applies on creation; tighten a pre-existing file too.
+    os.fchmod(fd, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(payload)
+
+
+def get_onemap_token(refresh: bool = False) -> str:
+    """Return a OneMap token, reusing the on-disk one unless `refresh` is set."""
+    if not refresh:
+        cached = load_cached_token()
+        if cached:
+            return cached
     load_dotenv()
     email = os.environ.get("ONE_MAP_EMAIL")
     password = os.environ.get("ONE_MAP_PASS")
@@ -76,17 +208,31 @@ def get_onemap_token() -> str:
         raise RuntimeError(
             "ONE_MAP_EMAIL and ONE_MAP_PASS must be set in the environment"
         )
-    resp = requests.post(
+    resp = _SESSION.post(
         ONEMAP_TOKEN_URL, json={"email": email, "password": password}, timeout=10
     )
     resp.raise_for_status()
     data = resp.json()
-    return data["access_token"]
+    token = data["access_token"]
+    save_cached_token(token, int(data["expiry_timestamp"]))
+    return token
+
 
+def authorize_session(token: str) -> None:
+    _SESSION.headers["Authorization"] = f"Bearer {token}"
 
-def geocode_postal(postal: str, token: str) -> Tuple[float, float]:
+
+def geocode_postal(postal: str, retry_auth: bool = True) -> Tuple[float, float]:
     url = ONEMAP_SEARCH_URL.format(postal=postal)
-    resp = requests.get(url, headers={"Authorization": f"Bearer {token}"}, timeout=10)
+    sent_auth = _SESSION.headers.get("Authorization")
+    resp = _SESSION.get(url, timeout=10)
+    if resp.status_code == 401 and retry_auth:
+        # Cached token was revoked or expired early; fetch a fresh one once,
+        # unless another worker already did while this request was in flight.
+        with _AUTH_LOCK:
+            if _SESSION.headers.get("Authorization") == sent_auth:
+                authorize_session(get_onemap_token(refresh=True))
+        return geocode_postal(postal, retry_auth=False)
     resp.raise_for_status()
     data = resp.json()
     results = data.get("results") or []
@@ -97,30 +243,118 @@ def geocode_postal(postal: str, token: str) -> Tuple[float, float]:
     return lat, lon
 
 
-def load_cache(path: Path) -> Dict[str, Tuple[float, float]]:
+def load_json_cache(path: Path) -> Dict[str, Tuple[float, float]]:
     if path.exists():
-        with path.open("r", encoding="utf-8") as f:
-            raw = json.load(f)
-            return {k: tuple(v) for k, v in raw.items()}
+        raw = read_json(path)
+        return {k: tuple(v) for k, v in raw.items()}
     return {}
 
 
-def save_cache(path: Path, cache: Dict[str, Tuple[float, float]]) -> None:
+def open_cache(path: Path) -> sqlite3.Connection:
+    """Open the SQLite geocode cache, importing the legacy JSON cache once.
+
+    A legacy `.json` cache path (the old default) is accepted and maps to the
+    `.db` file next to it, which is seeded from that JSON.
+    """
+    legacy = path.with_suffix(".json")
+    path = path.with_suffix(".db") if path.suffix == ".json" else path
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(cache, f, indent=2)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS geo ("
+        "postal TEXT PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL)"
+    )
+    # user_version records that the one-off JSON import has run, so an empty
+    # cache does not re-parse the legacy file on every invocation.
+    if conn.execute("PRAGMA user_version").fetchone()[0] == 0:
+        save_cache(conn, load_json_cache(legacy))
+        conn.execute("PRAGMA user_version = 1")
+    return conn
+
+
+def load_cache(
+    conn: sqlite3.Connection, postals: Iterable[str]
+) -> Dict[str, Tuple[float, float]]:
+    postals = list(postals)
+    cache: Dict[str, Tuple[float, float]] = {}
+    for start in range(0, len(postals), SQLITE_IN_CHUNK):
+        chunk = postals[start : start + SQLITE_IN_CHUNK]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT postal, lat, lon FROM geo WHERE postal IN ({placeholders})",
+            chunk,
+        )
+        cache.update((postal, (lat, lon)) for postal, lat, lon in rows)
+    return cache
+
+
+def save_cache(
+    conn: sqlite3.Connection, entries: Dict[str, Tuple[float, float]]
+) -> None:
+    """Insert only the given entries; the rest of the cache is left untouched."""
+    conn.executemany(
+        "INSERT OR REPLACE INTO geo (postal, lat, lon) VALUES (?, ?, ?)",
+        ((postal, lat, lon) for postal, (lat, lon) in entries.items()),
+    )
+    conn.commit()
 
 
 def ensure_coords(
-    postals: Iterable[str], token: str, cache: Dict[str, Tuple[float, float]]
-):
-    missing = []
-    for postal in postals:
-        if postal not in cache:
-            missing.append(postal)
-    for postal in missing:
-        cache[postal] = geocode_postal(postal, token)
-    return cache
+    postals: Iterable[str], conn: sqlite3.Connection
+) -> Tuple[Dict[str, Tuple[float, float]], int]:
+    """Return coords for `postals` and how many had to be geocoded and cached.
+
+    A fully cached set returns early: no OneMap auth, no cache write.
+    """
+    postals = list(postals)
+    cache = load_cache(conn, postals)
+    missing = [postal for postal in postals if postal not in cache]
+    if not missing:
+        return cache, 0
+    authorize_session(get_onemap_token())
+    # Geocoding is pure network latency, so overlap the round-trips.
+    with ThreadPoolExecutor(max_workers=GEOCODE_WORKERS) as ex:
+        results = ex.map(geocode_postal, missing)
+        fetched = dict(zip(missing, results))
+    save_cache(conn, fetched)
+    cache.update(fetched)
+    return cache, len(fetched)
+
+
+class StopMarkers(MacroElement):
+    """Draw a route's stops as Leaflet circle markers from one JS data array.
+
+    Replaces one folium.CircleMarker (and one template render) per stop with a
+    single element. `coords` is an (N, 2) lat/lon array and `stops` holds the
+    matching ``[label, radius]`` pairs; labels must already be HTML-escaped.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = {{ this.coords_json }};
+            var {{ this.get_name() }}_stops = {{ this.stops|tojson }};
+            {{ this.get_name() }}.forEach(function (latlon, i) {
+                var stop = {{ this.get_name() }}_stops[i];
+                L.circleMarker(latlon, {
+                    radius: stop[1],
+                    color: {{ this.color|tojson }},
+                    fill: true,
+                    fillColor: {{ this.color|tojson }}
+                }).bindPopup(stop[0]).bindTooltip(stop[0])
+                  .addTo({{ this._parent.get_name() }});
+            });
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, coords: np.ndarray, stops: List[list], color: str):
+        super().__init__()
+        self._name = "StopMarkers"
+        # Numbers only, so the raw JSON is safe to inline in the script tag.
+        self.coords_json = dumps_coords(coords)
+        self.stops = stops
+        self.color = color
 
 
 def add_route_layers(
@@ -143,45 +377,46 @@ def add_route_layers(
         "#17becf",
     ]
 
+    # Bind hot-loop attribute lookups to locals once instead of per stop.
+    get_demand = demands.get
+
     for idx, route in enumerate(routes):
         color = palette[idx % len(palette)]
-        poly_points: List[Tuple[float, float]] = []
+        layer = folium.FeatureGroup(name=f"Truck {idx + 1}")
+        route_coords = np.array(
+            [coords[postal] for postal in route], dtype=np.float64
+        ).reshape(-1, 2)
+        stops: List[list] = []
+        add_stop = stops.append
         visit_order = 1
 
         for postal in route:
-            lat, lon = coords[postal]
-            demand = demands.get(postal, 0)
-            is_depot = postal == warehouse
-
-            if is_depot:
+            if postal == warehouse:
                 popup = f"Depot: {postal}"
-                tooltip = popup
                 radius = 7
             else:
+                demand = get_demand(postal, 0)
                 popup = f"#{visit_order}: {postal} — {demand / 1000:.0f}k"
-                tooltip = popup
                 radius = 5
                 visit_order += 1
 
-            folium.CircleMarker(
-                location=(lat, lon),
-                radius=radius,
-                color=color,
-                fill=True,
-                fill_color=color,
-                popup=popup,
-                tooltip=tooltip,
-            ).add_to(fmap)
+            # bindPopup/bindTooltip insert strings as HTML; escape them as
+            # folium's Popup did for CircleMarker.
+            add_stop([html.escape(popup), radius])
 
-            poly_points.append((lat, lon))
+        StopMarkers(route_coords, stops, color).add_to(layer)
 
         folium.PolyLine(
-            poly_points,
+            route_coords,
             color=color,
             weight=4,
             opacity=0.8,
             tooltip=f"Truck {idx + 1}",
-        ).add_to(fmap)
+        ).add_to(layer)
+
+        layer.add_to(fmap)
+
+    folium.LayerControl().add_to(fmap)
 
 
 def main() -> None:
@@ -209,8 +444,11 @@ def main() -> None:
     parser.add_argument(
         "--cache",
         type=Path,
-        default=Path("../data/geo_cache.json"),
-        help="Geocode cache file",
+        default=Path("../data/geo_cache.db"),
+        help=(
+            "SQLite geocode cache file; a legacy .json path uses the .db "
+            "file beside it, seeded once from that JSON"
+        ),
     )
     parser.add_argument(
         "--warehouse",
@@ -223,22 +461,23 @@ def main() -> None:
     routes = load_routes(args.routes)
     demands = load_customers(args.customers)
 
-    token = get_onemap_token()
-    cache = load_cache(args.cache)
+    conn = open_cache(args.cache)
 
     all_postals = set(p for route in routes for p in route)
-    cache = ensure_coords(all_postals, token, cache)
-    save_cache(args.cache, cache)
-
-    # Center map on warehouse or first postal
+    # Center map on warehouse or first postal; geocode it in the same pass
     center_postal = args.warehouse or next(iter(all_postals))
-    if center_postal not in cache:
-        cache = ensure_coords([center_postal], token, cache)
-        save_cache(args.cache, cache)
+    cache, added = ensure_coords(all_postals | {center_postal}, conn)
+    conn.close()
+    if added:
+        print(f"Geocoded and cached {added} new postal codes")
     center_lat, center_lon = cache[center_postal]
 
+    # Canvas rendering keeps hundreds of circle markers off the SVG DOM.
     fmap = folium.Map(
-        location=(center_lat, center_lon), zoom_start=12, control_scale=True
+        location=(center_lat, center_lon),
+        zoom_start=12,
+        control_scale=True,
+        prefer_canvas=True,
     )
     add_route_layers(fmap, routes, cache, demands, args.warehouse)
 
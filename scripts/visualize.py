@@ -1,39 +1,77 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 
-# Load CSV
-df = pd.read_csv("best_so_far.csv")
-
-# Extract the early stopping iteration (take the first row's value)
-ended_early_iteration = df["ended_early_iteration"].iloc[0]
-
-# Plot main line
-plt.plot(
-    df["iteration"],
-    df["new_best_so_far"],
-    marker="o",
-    linestyle="-",
-    color="b",
-    label="Best So Far",
-)
-
-# Plot a vertical line at early stopping iteration
-plt.axvline(
-    x=ended_early_iteration,
-    color="r",
-    linestyle="--",
-    label=f"Early Stop (Iteration {ended_early_iteration})",
-)
-
-# Labels and Title
-plt.xlabel("Iteration")
-plt.ylabel("Best So Far")
-plt.title("Best So Far Over Iterations with Early Stop Marker")
-
-# Show Grid and Legend
-plt.grid(True)
-plt.legend()
-
-# Save or Show Plot
-plt.savefig("best_so_far_plot.png")
-plt.show()
+try:
+    import pyarrow.csv as pacsv
+except ImportError:  # optional; pandas is the fallback reader
+    pacsv = None
+    import pandas as pd
+
+
+def read_best_so_far(csv_path):
+    """Return (iteration, new_best_so_far, ended_early_iteration) from the CSV."""
+    if pacsv is not None:
+        # ended_early_iteration is constant, so only the first block is needed
+        with pacsv.open_csv(csv_path) as reader:
+            ended_early_iteration = reader.read_next_batch()[
+                "ended_early_iteration"
+            ][0].as_py()
+        table = pacsv.read_csv(
+            csv_path,
+            convert_options=pacsv.ConvertOptions(
+                include_columns=["iteration", "new_best_so_far"]
+            ),
+        )
+        return (
+            table["iteration"].to_numpy(),
+            table["new_best_so_far"].to_numpy(),
+            ended_early_iteration,
+        )
+
+    df = pd.read_csv(
+        csv_path, usecols=["iteration", "new_best_so_far", "ended_early_iteration"]
+    )
+    return (
+        df["iteration"].to_numpy(),
+        df["new_best_so_far"].to_numpy(),
+        df["ended_early_iteration"].iloc[0],
+    )
+
+
+def plot_best_so_far(csv_path="best_so_far.csv", output_path="best_so_far_plot.png"):
+    # Load CSV
+    iteration, new_best_so_far, ended_early_iteration = read_best_so_far(csv_path)
+
+    # Plot main line
+    plt.plot(
+        iteration,
+        new_best_so_far,
+        marker="o",
+        linestyle="-",
+        color="b",
+        label="Best So Far",
+    )
+
+    # Plot a vertical line at early stopping iteration
+    plt.axvline(
+        x=ended_early_iteration,
+        color="r",
+        linestyle="--",
+        label=f"Early Stop (Iteration {ended_early_iteration})",
+    )
+
+    # Labels and Title
+    plt.xlabel("Iteration")
+    plt.ylabel("Best So Far")
+    plt.title("Best So Far Over Iterations with Early Stop Marker")
+
+    # Show Grid and Legend
+    plt.grid(True)
+    plt.legend()
+
+    # Save or Show Plot
+    plt.savefig(output_path)
+    plt.show()
+
+
+if __name__ == "__main__":
+    plot_best_so_far()